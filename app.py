@@ -1,13 +1,28 @@
 
 import os
 import io
-from typing import List, Dict, Optional
-
+import base64
+import hashlib
+import tempfile
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, List, Dict, Optional, Tuple
+
+import httpx
+import numpy as np
 import streamlit as st
-from streamlit_mic_recorder import mic_recorder
-from groq import Groq
+from groq import DefaultHttpxClient, Groq
 import streamlit.components.v1 as components
 
+_FITZ_OK = True
+try:
+    import fitz  # PyMuPDF
+except Exception:
+    _FITZ_OK = False
+
 _PDF_OK = True
 try:
     from pypdf import PdfReader
@@ -21,6 +36,19 @@ CHAT_MODEL = "llama-3.3-70b-versatile"
 # CHAT_MODEL = "openai/gpt-oss-120b"
 DEFAULT_RESUME_PATH = "file/resumepdf.pdf"  # Path to your default resume
 DEFAULT_POINTS_PATH = "file/merged.pdf"  # Path to your default important points document
+PDF_CACHE_DIR = os.path.join(tempfile.gettempdir(), "pdfcache")  # Extracted text survives app restarts
+STREAM_WINDOW_S = 2.0  # New audio needed before the next live transcription pass
+STREAM_PROMPT_WORDS = 40  # Committed words passed to Whisper as context for the next window
+STREAM_MAX_WINDOW_S = 15.0  # Past this, a window's hypothesis is committed even without agreement
+STT_WORKERS = 16  # Live transcription threads shared by all sessions (one pass in flight per session)
+GROQ_MAX_CONNECTIONS = 32  # Shared by every session's chat stream and the STT workers
+ANSWER_RENDER_INTERVAL_S = 0.05  # Streamed answer deltas are coalesced into batches this long...
+ANSWER_RENDER_MAX_PIECES = 16  # ...or this many pieces, whichever comes first
+MAX_TURNS = 6  # Q/A pairs of conversation history kept in the prompt
+VAD_MIN_RMS = 200  # int16 RMS below this is treated as silence
+VAD_MIN_DURATION_S = 0.4  # Shorter clips are treated as accidental clicks
+VAD_FRAME_S = 0.03  # Energy is measured per frame, so a short question in a long clip still counts
+VAD_MIN_VOICED_S = 0.2  # Frames above VAD_MIN_RMS must add up to this much; clicks and bumps don't
 
 SYSTEM_PROMPT = """
 You are role-playing as a human job candidate in a live interview.
@@ -41,6 +69,7 @@ One more thing to remember-
 You are also provided a document along with resume which has many important points to remember while answering question, imformation like which chip, fpga, or microcontroller is used in which project is mentioned there. Please refer to that along with the resume to answer your questions.
 Important Point : if you are writing code in response, write comments in the code that clearly explain what that line of code does, please remember this, this is a very important point. 
 """
+_SYSTEM_PROMPT_STRIPPED = SYSTEM_PROMPT.strip()
 
 st.set_page_config(page_title="", layout="centered")
 
@@ -75,14 +104,41 @@ else:
 
 @st.cache_resource(show_spinner=False)
 def get_groq_client() -> Groq:
-    return Groq()
+    # STT and chat hit the same host back to back, so keep one warm HTTP/2 connection pool
+    # (DefaultHttpxClient keeps the SDK's own defaults such as follow_redirects)
+    http_client = DefaultHttpxClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=8,
+            keepalive_expiry=60,
+        ),
+        timeout=60.0,
+    )
+    return Groq(http_client=http_client)
 
 client = get_groq_client()
 
-@st.cache_data(show_spinner=False)
-def extract_pdf_text(pdf_bytes: bytes) -> str:
+def _parse_pdf_text(pdf_bytes: bytes) -> str:
+    if _FITZ_OK:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            n = doc.page_count
+            parts = [""] * n
+            i = 0
+            try:
+                for i in range(n):
+                    parts[i] = doc[i].get_text("text")
+            except Exception:
+                # Pathological PDF: finish page by page, skipping pages that fail
+                for j in range(i, n):
+                    try:
+                        parts[j] = doc[j].get_text("text")
+                    except Exception:
+                        parts[j] = ""
+            return "\n".join(parts).strip()
     if not _PDF_OK:
         return ""
+    # Fallback for environments without MuPDF
     reader = PdfReader(io.BytesIO(pdf_bytes))
     parts = []
     for page in reader.pages:
@@ -92,6 +148,59 @@ def extract_pdf_text(pdf_bytes: bytes) -> str:
             continue
     return "\n".join(parts).strip()
 
+def extract_pdf_text(pdf_bytes: bytes) -> str:
+    # One blake2b pass per call; Streamlit then only hashes the short digest
+    digest = hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest()
+    return _extract_pdf_text_cached(digest, pdf_bytes)
+
+@st.cache_data(show_spinner=False)
+def _extract_pdf_text_cached(digest: str, _pdf_bytes: bytes) -> str:
+    # In-process cache above (the underscore keeps the bytes out of the key),
+    # on-disk cache keyed by the same digest below
+    if not _FITZ_OK and not _PDF_OK:
+        return ""
+    cache_path = Path(PDF_CACHE_DIR) / f"{digest}.txt"
+    try:
+        return cache_path.read_text(encoding="utf-8")
+    except OSError:
+        pass
+    text = _parse_pdf_text(_pdf_bytes)
+    try:
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=PDF_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+    return text
+
+@st.cache_resource(show_spinner=False)
+def get_stt_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=STT_WORKERS, thread_name_prefix="stt")
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def extract_pdf_texts(sources: List[Optional[Tuple[str, Callable[[], bytes]]]]) -> List[Optional[str]]:
+    # Text already extracted in this session is reused without loading or hashing
+    # the bytes again. Misses are parsed one after the other: PyMuPDF is not
+    # thread-safe and holds the GIL, and pypdf is pure Python
+    known: Dict[str, str] = st.session_state.pdf_texts
+    for src in sources:
+        if src is not None and src[0] not in known:
+            key, load = src
+            known[key] = extract_pdf_text(load())
+    return [known[src[0]] if src is not None else None for src in sources]
+
+def _prewarm_groq():
+    # Opens the pooled connection (DNS, TCP, TLS, HTTP/2) before the first real request
+    try:
+        client.models.list()
+    except Exception:
+        pass
+
 def init_state():
     if "history" not in st.session_state:
         st.session_state.history: List[Dict[str, str]] = []
@@ -101,40 +210,159 @@ def init_state():
         st.session_state.last_transcript: Optional[str] = None
     if "last_response" not in st.session_state:
         st.session_state.last_response: Optional[str] = None
-    if "_cleared_for_this_round" not in st.session_state:
-        st.session_state._cleared_for_this_round = False
-    if "qa_pairs" not in st.session_state:
-        st.session_state.qa_pairs = 0
+    if "stream" not in st.session_state:
+        st.session_state.stream: Optional[Dict[str, Any]] = None
     if "default_files_used" not in st.session_state:
         st.session_state.default_files_used = False
+    if "pdf_texts" not in st.session_state:
+        st.session_state.pdf_texts: Dict[str, str] = {}
+    if "_prewarmed" not in st.session_state:
+        st.session_state._prewarmed = True
+        threading.Thread(target=_prewarm_groq, daemon=True).start()
 
 init_state()
 
-def groq_stt_from_wav_bytes(wav_bytes: bytes, language: Optional[str] = None) -> str:
+def groq_stt_from_wav_bytes(wav_bytes: bytes, language: Optional[str] = None, prompt: Optional[str] = None) -> str:
     file_tuple = ("audio.wav", wav_bytes)
     transcription = client.audio.transcriptions.create(
         file=file_tuple,
         model=STT_MODEL,
         **({"language": language} if language else {}),
+        **({"prompt": prompt} if prompt else {}),
         response_format="text",
         temperature=0.0,
     )
     return str(transcription)
 
+def groq_stt_words(wav_bytes: bytes, prompt: Optional[str] = None) -> List[Tuple[float, float, str]]:
+    transcription = client.audio.transcriptions.create(
+        file=("audio.wav", wav_bytes),
+        model=STT_MODEL,
+        **({"prompt": prompt} if prompt else {}),
+        response_format="verbose_json",
+        timestamp_granularities=["word"],
+        temperature=0.0,
+    )
+    words = transcription.to_dict().get("words") or []
+    return [(w["start"], w["end"], w["word"].strip()) for w in words if w.get("word", "").strip()]
+
+def pcm_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    # 44-byte RIFF header in front of the raw 16-bit mono samples, no re-encode
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + len(pcm), b"WAVE",
+        b"fmt ", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b"data", len(pcm),
+    )
+    return header + pcm
+
+def is_silent(pcm: bytes, sample_rate: int) -> bool:
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    if samples.size < VAD_MIN_DURATION_S * sample_rate:
+        return True
+    frame = int(VAD_FRAME_S * sample_rate)
+    n = samples.size // frame
+    frames = samples[: n * frame].astype(np.float32).reshape(n, frame)
+    rms = np.sqrt((frames ** 2).mean(axis=1))
+    voiced = int((rms >= VAD_MIN_RMS).sum())
+    return voiced * frame < VAD_MIN_VOICED_S * sample_rate
+
+def new_stream_state(session: int, sample_rate: int) -> Dict[str, Any]:
+    return {
+        "session": session,
+        "sample_rate": sample_rate,
+        "pcm": bytearray(),  # 16-bit mono samples received so far
+        "buf_start": 0,      # first sample not covered by committed words
+        "stt_at": 0,         # samples received at the last live transcription
+        "committed": [],     # words confirmed by two consecutive hypotheses
+        "pending": [],       # last hypothesis for the unconfirmed audio
+        "inflight": None,    # (start, end, future) of the live pass running in the background
+        "done": False,
+    }
+
+def _norm_word(word: str) -> str:
+    return word.lower().strip(".,!?;:\"'")
+
+def _stream_drop_audio(stream: Dict[str, Any], keep_from: int) -> None:
+    # Commits whatever was heard before dropping the audio behind it, and never
+    # cuts into a word that was just committed
+    pending = stream["pending"]
+    if pending:
+        stream["committed"].extend(w for _, _, w in pending)
+        keep_from = max(keep_from, int(pending[-1][1] * stream["sample_rate"]))
+        stream["pending"] = []
+    stream["buf_start"] = max(stream["buf_start"], keep_from)
+
+def stream_start_window(stream: Dict[str, Any]) -> None:
+    # Sends the unconfirmed audio to Whisper in the background; the script run
+    # (and Stop) never waits on it
+    sr = stream["sample_rate"]
+    start = stream["buf_start"]
+    end = len(stream["pcm"]) // 2
+    stream["stt_at"] = end
+    window = bytes(stream["pcm"][start * 2:end * 2])
+    if is_silent(window, sr):
+        # Don't carry silence into the next pass or the Stop tail; Whisper also
+        # tends to hallucinate on long quiet stretches
+        _stream_drop_audio(stream, end - int(STREAM_WINDOW_S * sr))
+        return
+    prompt = " ".join(stream["committed"][-STREAM_PROMPT_WORDS:])
+    future = get_stt_executor().submit(groq_stt_words, pcm_to_wav(window, sr), prompt)
+    stream["inflight"] = (start, end, future)
+
+def stream_merge_window(stream: Dict[str, Any]) -> None:
+    # LocalAgreement-2: words two consecutive passes agree on are committed,
+    # and the audio behind them is dropped from the next window.
+    start, end, future = stream["inflight"]
+    stream["inflight"] = None
+    sr = stream["sample_rate"]
+    offset = start / sr
+    words = [(s + offset, e + offset, w) for s, e, w in future.result()]
+    prev = stream["pending"]
+    n = 0
+    while n < min(len(prev), len(words)) and _norm_word(prev[n][2]) == _norm_word(words[n][2]):
+        n += 1
+    if end - start >= STREAM_MAX_WINDOW_S * sr:
+        # Passes that keep disagreeing would grow the upload without bound; trust
+        # this one for all but its last word, which may be cut off
+        n = max(n, len(words) - 1)
+    if n:
+        stream["committed"].extend(w for _, _, w in words[:n])
+        stream["buf_start"] = int(words[n - 1][1] * sr)
+    stream["pending"] = words[n:]
+    if end - stream["buf_start"] >= STREAM_MAX_WINDOW_S * sr:
+        # Still no word boundary close enough to the end: keep only the most recent audio
+        _stream_drop_audio(stream, end - int(STREAM_WINDOW_S * sr))
+
+def stream_finish(stream: Dict[str, Any]) -> str:
+    # Only the audio after the last committed word still needs a round trip
+    sr = stream["sample_rate"]
+    tail = bytes(stream["pcm"][stream["buf_start"] * 2:])
+    committed = " ".join(stream["committed"])
+    if not tail:
+        return committed
+    prompt = " ".join(stream["committed"][-STREAM_PROMPT_WORDS:])
+    rest = groq_stt_from_wav_bytes(pcm_to_wav(tail, sr), language=None, prompt=prompt).strip()
+    return f"{committed} {rest}".strip()
+
 def clamp_text(txt: str, max_chars: int = 16000) -> str:
     return txt if len(txt) <= max_chars else txt[:max_chars] + "\n…[truncated]"
 
-def build_messages() -> List[Dict[str, str]]:
-    msgs: List[Dict[str, str]] = [{"role": "system", "content": SYSTEM_PROMPT.strip()}]
-    resume = st.session_state.resume_text.strip()
-    if resume:
+@st.cache_resource(show_spinner=False, max_entries=8)
+def build_prefix_messages(resume_text: str) -> List[Dict[str, str]]:
+    # Built once per resume so every turn sends a byte-identical prefix that the
+    # provider's prompt cache can reuse; shared across reruns, so never mutate it
+    msgs: List[Dict[str, str]] = [{"role": "system", "content": _SYSTEM_PROMPT_STRIPPED}]
+    if resume_text:
         msgs.append({
             "role": "system",
-            "content": "Resume context (verbatim; use as factual background):\n" + clamp_text(resume),
+            "content": "Resume context (verbatim; use as factual background):\n" + resume_text,
         })
-    msgs.extend(st.session_state.history)
     return msgs
 
+def build_messages() -> List[Dict[str, str]]:
+    return build_prefix_messages(st.session_state.resume_text) + st.session_state.history
+
 def groq_chat_stream(messages: List[Dict[str, str]], temperature: float = 0.5, top_p: float = 1.0):
     stream = client.chat.completions.create(
         model=CHAT_MODEL,
@@ -144,17 +372,18 @@ def groq_chat_stream(messages: List[Dict[str, str]], temperature: float = 0.5, t
         stream=True,
     )
     for chunk in stream:
-        if not chunk or not getattr(chunk, "choices", None):
+        try:
+            content = chunk.choices[0].delta.content
+        except (AttributeError, IndexError, TypeError):
             continue
-        delta = chunk.choices[0].delta
-        if delta and getattr(delta, "content", None):
-            yield delta.content
+        if content:
+            yield content
 
 
 
 with st.sidebar.expander("📄 Resume uploads (PDF)", expanded=False):
-    if not _PDF_OK:
-        st.warning("Install pypdf for resume extraction: `pip install pypdf`")
+    if not _FITZ_OK and not _PDF_OK:
+        st.warning("Install PyMuPDF for resume extraction: `pip install pymupdf`")
     up1 = st.file_uploader("Resume upload 1", type=["pdf"], key="resume1")
     up2 = st.file_uploader("Important Points To Remember", type=["pdf"], key="resume2")
 
@@ -162,38 +391,35 @@ with st.sidebar.expander("📄 Resume uploads (PDF)", expanded=False):
     files_uploaded = False
     
     # Process uploaded files first
-    if up1 is not None:
-        txt1 = extract_pdf_text(up1.getvalue())
-        if txt1:
-            combined_resume.append("=== Resume 1 ===\n" + txt1)
-            files_uploaded = True
+    txt1, txt2 = extract_pdf_texts([
+        (f"upload:{up1.file_id}", up1.getvalue) if up1 is not None else None,
+        (f"upload:{up2.file_id}", up2.getvalue) if up2 is not None else None,
+    ])
+
+    if txt1:
+        combined_resume.append(f"=== Resume 1 ===\n{txt1}")
+        files_uploaded = True
     
-    if up2 is not None:
-        txt2 = extract_pdf_text(up2.getvalue())
-        if txt2:
-            combined_resume.append("=== Important Points to Remember ===\n" + txt2)
-            files_uploaded = True
+    if txt2:
+        combined_resume.append(f"=== Important Points to Remember ===\n{txt2}")
+        files_uploaded = True
     
     # If no files uploaded, use default files
     if not files_uploaded and not st.session_state.default_files_used:
         try:
-            # Load default resume
-            if os.path.exists(DEFAULT_RESUME_PATH):
-                with open(DEFAULT_RESUME_PATH, "rb") as f:
-                    default_resume_bytes = f.read()
-                txt1 = extract_pdf_text(default_resume_bytes)
-                if txt1:
-                    combined_resume.append("=== Default Resume ===\n" + txt1)
-                    st.info("Using default resume file")
-            
-            # Load default points document
-            if os.path.exists(DEFAULT_POINTS_PATH):
-                with open(DEFAULT_POINTS_PATH, "rb") as f:
-                    default_points_bytes = f.read()
-                txt2 = extract_pdf_text(default_points_bytes)
-                if txt2:
-                    combined_resume.append("=== Default Important Points ===\n" + txt2)
-                    st.info("Using default important points file")
+            # Load default resume and points document
+            txt1, txt2 = extract_pdf_texts([
+                (f"default:{path}", partial(_read_bytes, path)) if os.path.exists(path) else None
+                for path in (DEFAULT_RESUME_PATH, DEFAULT_POINTS_PATH)
+            ])
+
+            if txt1:
+                combined_resume.append(f"=== Default Resume ===\n{txt1}")
+                st.info("Using default resume file")
+
+            if txt2:
+                combined_resume.append(f"=== Default Important Points ===\n{txt2}")
+                st.info("Using default important points file")
             
             st.session_state.default_files_used = True
             
@@ -205,24 +431,32 @@ with st.sidebar.expander("📄 Resume uploads (PDF)", expanded=False):
         st.session_state.default_files_used = False
     
     if combined_resume:
-        st.session_state.resume_text = "\n\n".join(combined_resume).strip()
+        # Clamped once here so the per-turn path only reuses it; the parts are
+        # already stripped by extract_pdf_text
+        st.session_state.resume_text = clamp_text("\n\n".join(combined_resume))
 
 transcript_box = st.empty()
 answer_box = st.empty()
 
-def clear_visible_output():
+def reset_last_turn():
+    # The placeholders are recreated empty on every rerun, so clearing them here
+    # would only cost extra frontend messages before they are written again
     st.session_state.last_transcript = None
     st.session_state.last_response = None
-    transcript_box.empty()
-    answer_box.empty()
 
-rec = mic_recorder(
+pcm_recorder = components.declare_component(
+    "pcm_recorder",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "pcm_recorder"),
+)
+
+_stream = st.session_state.stream
+rec = pcm_recorder(
     start_prompt="🎙️ Start recording",
     stop_prompt="⏹️ Stop recording",
-    use_container_width=True,
-    just_once=False,
-    format="wav",
+    session=_stream["session"] if _stream else 0,
+    acked=len(_stream["pcm"]) // 2 if _stream else 0,
     key="one_button",
+    default=None,
 )
 
 components.html(
@@ -260,10 +494,16 @@ components.html(
 
         const findRecorderButton = () => {
           const labels = ["🎙️ Start recording", "⏹️ Stop recording"];
-          const btns = Array.from(rootDoc.querySelectorAll('button'));
-          for (const b of btns) {
-            const txt = (b.innerText || "").trim();
-            if (labels.some(l => txt.includes(l))) return b;
+          const docs = [rootDoc];
+          for (const f of Array.from(rootDoc.querySelectorAll('iframe'))) {
+            try { if (f.contentDocument) docs.push(f.contentDocument); } catch(e) {}
+          }
+          for (const d of docs) {
+            const btns = Array.from(d.querySelectorAll('button'));
+            for (const b of btns) {
+              const txt = (b.innerText || "").trim();
+              if (labels.some(l => txt.includes(l))) return b;
+            }
           }
           return null;
         };
@@ -290,35 +530,82 @@ components.html(
     height=0
 )
 
-if rec and isinstance(rec, dict) and rec.get("recording", False):
-    if not st.session_state._cleared_for_this_round:
-        clear_visible_output()
-        st.session_state._cleared_for_this_round = True
+if rec and isinstance(rec, dict) and rec.get("session"):
+    stream = st.session_state.stream
+    if stream is None or stream["session"] != rec["session"]:
+        reset_last_turn()
+        stream = st.session_state.stream = new_stream_state(rec["session"], rec["sample_rate"])
 
-if rec and isinstance(rec, dict) and rec.get("bytes"):
-    audio_bytes: bytes = rec["bytes"]
-    clear_visible_output()
-    try:
-        transcript = groq_stt_from_wav_bytes(audio_bytes, language=None)
-        st.session_state.last_transcript = transcript.strip()
-        transcript_box.write(st.session_state.last_transcript)
-    except Exception as e:
-        answer_box.error(f"Transcription error: {e}")
-    else:
-        st.session_state.history.append({"role": "user", "content": st.session_state.last_transcript})
-        full_text = ""
+    if not stream["done"]:
+        start = rec.get("start", 0) * 2
+        if start <= len(stream["pcm"]):
+            stream["pcm"][start:] = base64.b64decode(rec.get("pcm") or "")
+
+    if not stream["done"] and stream["inflight"] is not None and stream["inflight"][2].done():
         try:
-            messages = build_messages()
-            for piece in groq_chat_stream(messages, temperature=0.5, top_p=1.0):
-                full_text += piece
-                answer_box.markdown(full_text)
+            stream_merge_window(stream)
+        except Exception:
+            pass  # The tail pass on Stop still covers this audio
+
+    if not stream["done"] and not rec.get("final"):
+        received = len(stream["pcm"]) // 2
+        if stream["inflight"] is None and received - stream["stt_at"] >= STREAM_WINDOW_S * stream["sample_rate"]:
+            stream_start_window(stream)
+        live = stream["committed"] + [w for _, _, w in stream["pending"]]
+        if live:
+            transcript_box.write(" ".join(live))
+
+    elif (
+        not stream["done"]
+        and not stream["committed"]
+        and not stream["pending"]
+        and is_silent(stream["pcm"], stream["sample_rate"])
+    ):
+        # Words already heard by the live pass mean there was speech, whatever the energy says
+        stream["done"] = True
+        answer_box.info("No speech detected. Hold the recording a little longer and speak up.")
+
+    elif not stream["done"]:
+        stream["done"] = True
+        # A pass still running is left to finish on its own; the tail covers its audio
+        stream["inflight"] = None
+        transcript = None
+        try:
+            transcript = stream_finish(stream).strip()
         except Exception as e:
-            answer_box.error(f"LLM error: {e}")
-        else:
-            st.session_state.last_response = full_text.strip()
-            st.session_state.history.append({"role": "assistant", "content": st.session_state.last_response})
-            st.session_state.qa_pairs += 1
-            if st.session_state.qa_pairs >= 5:
-                st.session_state.history = []
-                st.session_state.qa_pairs = 0
-    st.session_state._cleared_for_this_round = False
+            answer_box.error(f"Transcription error: {e}")
+
+        if transcript == "":
+            # Whisper returns empty text on noise; don't spend an LLM call or a history slot on it
+            answer_box.info("Didn't catch that.")
+        elif transcript:
+            st.session_state.last_transcript = transcript
+            transcript_box.write(transcript)
+            st.session_state.history.append({"role": "user", "content": st.session_state.last_transcript})
+            pieces: List[str] = []
+            unrendered = 0
+            try:
+                messages = build_messages()
+                next_flush = time.monotonic() + ANSWER_RENDER_INTERVAL_S
+                for piece in groq_chat_stream(messages, temperature=0.5, top_p=1.0):
+                    pieces.append(piece)
+                    unrendered += 1
+                    if unrendered >= ANSWER_RENDER_MAX_PIECES or time.monotonic() >= next_flush:
+                        answer_box.markdown("".join(pieces))
+                        unrendered = 0
+                        next_flush = time.monotonic() + ANSWER_RENDER_INTERVAL_S
+                full_text = "".join(pieces)
+                answer_box.markdown(full_text)
+            except Exception as e:
+                answer_box.error(f"LLM error: {e}")
+            else:
+                st.session_state.last_response = full_text.strip()
+                st.session_state.history.append({"role": "assistant", "content": st.session_state.last_response})
+                st.session_state.history = st.session_state.history[-2 * MAX_TURNS:]
+
+    else:
+        # Later reruns (e.g. sidebar interactions) keep the last turn on screen
+        if st.session_state.last_transcript:
+            transcript_box.write(st.session_state.last_transcript)
+        if st.session_state.last_response:
+            answer_box.markdown(st.session_state.last_response)